@@ -1,8 +1,55 @@
 # coding=ISO-8859-1
+from concurrent.futures import ProcessPoolExecutor
+
 from utils import *
 import numpy as np
 
 
+# Shared read-only query structures, assigned in main() before the
+# worker pool starts so that forked workers inherit them
+# copy-on-write (on spawn-based platforms pass them via an
+# initializer instead)
+_QUERY_DATA = {}
+
+
+def process_group(args):
+    """
+    Worker for one node group: find the current geographic units of
+    the node for every one of its query years
+
+    Parameters
+    ----------
+    args : tuple
+        (node, dates) where dates is a datetime64 array of query dates
+
+    Returns
+    -------
+    currents : list of np.1darray, or None
+        Current code(s) per date, or None if the node was skipped
+        because its code length is neither 2 nor 4
+    """
+
+    node, dates = args
+    if (len(node) == 4):
+        kind = "kommun"
+    elif (len(node) == 2):
+        kind = "laen"
+    else:
+        return None
+
+    edge_table, all_current_set, in_current_mask = _QUERY_DATA[kind]
+    try:
+        return find_current_geo_batch(
+            edge_table=edge_table,
+            node=node, dates=dates,
+            all_current_set=all_current_set,
+            in_current_mask=in_current_mask,
+            print_info=False
+        )
+    except ValueError:
+        return [np.array([]) for _ in range(len(dates))]
+
+
 def main():
     # Current geographic units and changes    
     fp_current_kommun = "kommuner_in_shp.txt"
@@ -11,59 +58,84 @@ def main():
     fp_chg_laen = "laen_code_changes.txt"
     kommuner_in_shp = np.loadtxt(fname=fp_current_kommun, dtype=str)
     laen_in_shp = np.loadtxt(fname=fp_current_laen, dtype=str)
-    df_change_kommun = read_geo_changes(fp_chg_kommun)
-    df_change_laen = read_geo_changes(fp_chg_laen)
+    # Only the (src, dst, date) triples are needed here, so skip the
+    # DataFrame detour entirely
+    chg_kommun = read_geo_changes_arrays(fp_chg_kommun)
+    chg_laen = read_geo_changes_arrays(fp_chg_laen)
     
-    # Geographic unit/year pairs
-    fp_geo_year = "/geo_year.csv"
-    ar_geo_year = np.loadtxt(
-        fname="geo_year.csv", dtype=str, delimiter=",",
-        converters={
-            0: lambda s: s.zfill(len(s) + 1 if len(s) % 2 == 1 else len(s)),
-        }
+    # Geographic unit/year pairs; odd-length codes get one leading
+    # zero in a single vectorized pass instead of a per-line Python
+    # converter inside np.loadtxt
+    fp_geo_year = "geo_year.csv"
+    df_geo_year = pd.read_csv(
+        fp_geo_year, header=None, names=["node", "year"],
+        dtype={"node": str, "year": str}
     )
-
-    # Convert to multidigraph
-    graph_kommun = nx.from_pandas_edgelist(
-        df=df_change_kommun,
-        source="Gammal kod",
-        target="Ny kod",
-        edge_attr=["Datum ikrafttr�dande", "�ndringstyp"],
-        create_using=nx.MultiDiGraph()
+    df_geo_year["node"] = np.where(
+        df_geo_year["node"].str.len() % 2 == 1,
+        "0" + df_geo_year["node"],
+        df_geo_year["node"]
     )
-    graph_laen = nx.from_pandas_edgelist(
-        df=df_change_laen,
-        source="Gammal kod",
-        target="Ny kod",
-        edge_attr=["Datum ikrafttr�dande", "�ndringstyp"],
-        create_using=nx.MultiDiGraph()
+    # Convert the whole year column to datetime64 in one cast instead
+    # of parsing one string per row inside the workers
+    df_geo_year["date"] = (
+        df_geo_year["year"].to_numpy(dtype=str)
+                           .astype("datetime64[Y]")
+                           .astype("datetime64[D]")
     )
 
-    # Find current geographic units
+    # Flatten to structure-of-arrays edge tables and encode the
+    # current codes as bitmasks over the respective id spaces
+    table_kommun = build_edge_table_arrays(*chg_kommun)
+    table_laen = build_edge_table_arrays(*chg_laen)
+    mask_kommun = build_current_mask(table_kommun, kommuner_in_shp)
+    mask_laen = build_current_mask(table_laen, laen_in_shp)
+
+    # Publish the query structures for the worker processes; the
+    # current codes go in as sets for O(1) membership tests
+    _QUERY_DATA["kommun"] = (table_kommun,
+                             set(kommuner_in_shp.tolist()),
+                             mask_kommun)
+    _QUERY_DATA["laen"] = (table_laen,
+                           set(laen_in_shp.tolist()),
+                           mask_laen)
+
+    # Find current geographic units, batching the query dates per node
+    # so each node's reachable edges are only collected once, and
+    # spreading the independent node groups across cores; chunksize
+    # amortizes the IPC cost per task
+    results = [None] * len(df_geo_year)
+    groups = list(df_geo_year.groupby("node", sort=False))
+    with ProcessPoolExecutor() as ex:
+        currents_per_group = ex.map(
+            process_group,
+            [(node, group["date"].to_numpy())
+             for node, group in groups],
+            chunksize=256
+        )
+        for (node, group), currents in zip(groups, currents_per_group):
+            if currents is None:
+                continue
+            for row, year, current in zip(group.index, group["year"],
+                                          currents):
+                results[row] = (node, year, current)
+
+    # Write out in the original row order, buffering pre-formatted
+    # rows and flushing them in chunks instead of one print() call
+    # (and one array repr) per row
     with open("geo_year_current.txt", "w") as f:
-        for node, year in ar_geo_year:
-            # Use the correct objects for kommuner and l�n
-            if (len(node) == 4):
-                graph = graph_kommun
-                geo_in_shp = kommuner_in_shp
-            elif (len(node) == 2):
-                graph = graph_laen
-                geo_in_shp = laen_in_shp
-            else:
+        rows = []
+        for res in results:
+            if res is None:
                 continue
-            
-            try:
-                current = find_current_geo(
-                    graph=graph,
-                    node=node, date=np.datetime64(year),
-                    all_current=geo_in_shp,
-                    print_info=True
-                )
-            except ValueError:
-                current = np.array([])
-                
-            print(node, year, current,
-                  file=f)
+            node, year, current = res
+            rows.append(
+                "%s %s %s\n" % (node, year, " ".join(current.tolist()))
+            )
+            if (len(rows) >= 10000):
+                f.writelines(rows)
+                rows = []
+        f.writelines(rows)
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,11 @@
 # coding=ISO-8859-1
 import os
 import sys
+import functools
 import argparse as ap
+from collections import namedtuple
 import matplotlib.pyplot as plt
+import numba as nb
 import numpy as np
 import networkx as nx
 import pandas as pd
@@ -37,24 +40,79 @@ def read_geo_changes(fp_chg):
     
     # Load data
     df_change = pd.read_csv(fp_chg, encoding="ISO-8859-1", sep="\t",
-                            parse_dates=True, infer_datetime_format=True,
                             dtype={"Gammal kod":str, "Ny kod":str})
-    
-    # Change datatype for date to datetime 
+
+    # Change datatype for date to datetime; many rows share the same
+    # effective date, so parse each unique date string once (with an
+    # explicit format to skip per-value format inference) and map the
+    # column through the result
+    uniq_dates = df_change["Datum ikrafttr�dande"].unique()
+    date_map = pd.Series(pd.to_datetime(uniq_dates, format="%Y-%m-%d"),
+                         index=uniq_dates)
     df_change["Datum ikrafttr�dande"] = (
-        pd.to_datetime(df_change["Datum ikrafttr�dande"])
+        df_change["Datum ikrafttr�dande"].map(date_map)
     )
     
+    # Store the code columns as categoricals over one shared, sorted
+    # category set: the highly repeated short strings become small
+    # integer codes plus a single dictionary, which build_edge_table
+    # reuses directly as its node-id space
+    shared_codes = pd.api.types.union_categoricals(
+        [df_change["Gammal kod"].astype("category"),
+         df_change["Ny kod"].astype("category")]
+    ).categories.sort_values()
+    for col in ("Gammal kod", "Ny kod"):
+        df_change[col] = pd.Categorical(df_change[col],
+                                        categories=shared_codes)
+
     # Sort by ascending date
     df_change = (
         df_change
             .sort_values(["Datum ikrafttr�dande"])
             .reset_index(drop=True)
     )
-    
+
     return df_change
 
 
+def read_geo_changes_arrays(fp_chg):
+    """
+    Read the change data directly into flat NumPy arrays
+
+    Fast path for query-only scripts: the (src, dst, date) triples are
+    all they need, so no DataFrame is built and pandas stays off the
+    hot path. `read_geo_changes` remains for plotting, which wants the
+    full table.
+
+    Parameters
+    ----------
+    fp_chg : str
+        Directory of the input file
+
+    Returns
+    -------
+    src, dst : np.1darray
+        Old and new code per change, sorted by ascending effective
+        date
+    date : np.1darray
+        Effective dates as datetime64[D], in the same order
+    """
+
+    # Columns: 0 = "Gammal kod", 2 = "Ny kod",
+    # 5 = "Datum ikrafttr�dande"
+    arr = np.loadtxt(fp_chg, dtype=str, delimiter="\t",
+                     encoding="ISO-8859-1", skiprows=1,
+                     usecols=(0, 2, 5))
+    src = arr[:, 0]
+    dst = arr[:, 1]
+    date = arr[:, 2].astype("datetime64[D]")
+
+    # Sort by ascending date, mirroring read_geo_changes
+    order = np.argsort(date, kind="stable")
+
+    return src[order], dst[order], date[order]
+
+
 def create_nx_graph(df, print_info=True, **kwargs):
     """
     Create an NetworkX graph object from a pandas dataframe
@@ -91,6 +149,250 @@ def create_nx_graph(df, print_info=True, **kwargs):
     return graph
 
 
+# Structure-of-arrays representation of the change data: the sorted
+# unique codes (whose positions define an integer id space), a mapping
+# from code to id, and a CSR adjacency over the ids (indptr offsets
+# plus target ids and effective dates per edge, in CSR order; dates
+# are stored as int64 days since the epoch for the compiled kernel)
+EdgeTable = namedtuple(
+    "EdgeTable", ["node_names", "node2id", "indptr", "dst_ids", "dates"]
+)
+
+
+def _assemble_edge_table(node_names, src_ids, dst_ids, date):
+    """
+    Assemble an EdgeTable from pre-computed node ids
+
+    Parameters
+    ----------
+    node_names : np.1darray
+        Unique codes; positions define the id space
+    src_ids, dst_ids : np.1darray
+        Ids of the old and new code per change
+    date : np.1darray
+        Effective date per change, as datetime64
+
+    Returns
+    -------
+    edge_table : EdgeTable
+        Structure-of-arrays edge table
+    """
+
+    node2id = {name: i for i, name in enumerate(node_names)}
+
+    # CSR adjacency over the ids
+    order = np.argsort(src_ids, kind="stable")
+    counts = np.bincount(src_ids, minlength=node_names.size)
+    indptr = np.zeros(node_names.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    return EdgeTable(
+        node_names=node_names,
+        node2id=node2id,
+        indptr=indptr,
+        dst_ids=dst_ids[order],
+        dates=date[order].astype("datetime64[D]").astype(np.int64)
+    )
+
+
+def build_edge_table_arrays(src, dst, date):
+    """
+    Build an EdgeTable from flat code and date arrays, e.g. those
+    returned by `read_geo_changes_arrays`
+
+    Parameters
+    ----------
+    src, dst : np.1darray
+        Old and new code per change
+    date : np.1darray
+        Effective date per change, as datetime64
+
+    Returns
+    -------
+    edge_table : EdgeTable
+        Structure-of-arrays edge table
+    """
+
+    # node_names is sorted, so ids follow from a binary search
+    node_names = np.unique(np.concatenate((src, dst)))
+    src_ids = np.searchsorted(node_names, src).astype(np.int32)
+    dst_ids = np.searchsorted(node_names, dst).astype(np.int32)
+
+    return _assemble_edge_table(node_names, src_ids, dst_ids, date)
+
+
+def build_edge_table(df_change):
+    """
+    Flatten the change data into an EdgeTable, replacing the nested
+    dictionaries of a MultiDiGraph with flat arrays for the query path
+
+    Parameters
+    ----------
+    df_change : pd.DataFrame
+        Change data as returned by `read_geo_changes`
+
+    Returns
+    -------
+    edge_table : EdgeTable
+        Structure-of-arrays edge table
+    """
+
+    src_col = df_change["Gammal kod"]
+    dst_col = df_change["Ny kod"]
+    date = df_change["Datum ikrafttr�dande"].to_numpy()
+
+    # Map codes onto a contiguous integer id space
+    if (isinstance(src_col.dtype, pd.CategoricalDtype)
+            and src_col.dtype == dst_col.dtype):
+        # Both columns share one sorted category dictionary (see
+        # read_geo_changes), so the category codes already are the ids
+        node_names = src_col.cat.categories.to_numpy()
+        src_ids = src_col.cat.codes.to_numpy().astype(np.int32)
+        dst_ids = dst_col.cat.codes.to_numpy().astype(np.int32)
+        return _assemble_edge_table(node_names, src_ids, dst_ids, date)
+
+    return build_edge_table_arrays(src_col.to_numpy(),
+                                   dst_col.to_numpy(), date)
+
+
+def build_current_mask(edge_table, all_current):
+    """
+    Encode the current geographic codes as a boolean mask over the
+    node-id space of the edge table, so that intersecting a query
+    result with the current codes is a single vectorized AND
+
+    Parameters
+    ----------
+    edge_table : EdgeTable
+        Edge table built by `build_edge_table`
+    all_current : np.ndarray
+        Current geographic codes
+
+    Returns
+    -------
+    in_current_mask : np.1darray
+        Boolean mask over the node ids, True for current codes
+    """
+
+    in_current_mask = np.zeros(edge_table.node_names.size, dtype=bool)
+    in_current_mask[
+        [edge_table.node2id[s] for s in all_current
+         if s in edge_table.node2id]
+    ] = True
+
+    return in_current_mask
+
+
+# Registry mapping id(graph) to the graph object, so the lru_cache
+# below can key on graphs without requiring them to be hashable
+_GRAPHS = {}
+
+
+@nb.njit(cache=True)
+def _bfs_future_nodes(src_id, date, indptr, dst_ids, dates, n_nodes):
+    """
+    Breadth-first search over the CSR adjacency starting from src_id,
+    marking the endpoints of every reachable edge whose date is on or
+    after the given date
+
+    Traversal itself is *not* restricted by date: an old change may
+    chain into a newer one, and the newer edge must still be found.
+    The date test only decides which endpoints enter the result, which
+    matches filtering the edges of the descendant subgraph.
+
+    Parameters
+    ----------
+    src_id : int
+        Id of the query node
+    date : int
+        Query date, as int64 days since the epoch
+    indptr, dst_ids, dates : np.1darray
+        CSR arrays of an EdgeTable
+    n_nodes : int
+        Total number of node ids
+
+    Returns
+    -------
+    result : np.1darray
+        Boolean membership mask over the node ids
+    """
+
+    visited = np.zeros(n_nodes, dtype=np.bool_)
+    result = np.zeros(n_nodes, dtype=np.bool_)
+    queue = np.empty(n_nodes, dtype=np.int32)
+    visited[src_id] = True
+    queue[0] = src_id
+    head = 0
+    tail = 1
+    while head < tail:
+        u = queue[head]
+        head += 1
+        for e in range(indptr[u], indptr[u + 1]):
+            v = dst_ids[e]
+            if dates[e] >= date:
+                result[u] = True
+                result[v] = True
+            if not visited[v]:
+                visited[v] = True
+                queue[tail] = v
+                tail += 1
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _descendants_and_edges(graph_id, node):
+    """
+    Compute the descendants of the given node and the dated edges among
+    them, memoized per (graph, node) so that repeated queries on the
+    same node at different dates only pay the traversal cost once
+
+    Parameters
+    ----------
+    graph_id : int
+        id() of a graph previously registered in `_GRAPHS`
+    node : str
+        Query node name
+
+    Returns
+    -------
+    children_name : np.1darray
+        Names of the descendants of the node (including itself)
+    u_arr, v_arr : np.1darray
+        Source and target names of every dated edge among the
+        descendants
+    k_arr : np.1darray
+        Keys of those edges in the multigraph
+    date_arr : np.1darray
+        Dates of those edges, as datetime64
+    """
+
+    graph = _GRAPHS[graph_id]
+
+    # Extract the names of the children nodes; nx.descendants runs a
+    # plain BFS without building the distance dict that
+    # single_source_shortest_path_length would allocate and throw away
+    children_name = np.array([node] + list(nx.descendants(graph, node)))
+
+    # Extract the dated edges among the children as flat arrays so
+    # callers can filter by date with a vectorized comparison. The
+    # descendant set is closed under outgoing edges, so iterating the
+    # out-edges of the children gives the same edges as the induced
+    # subgraph without constructing a graph view
+    edge_list = list(
+        graph.edges(nbunch=children_name, keys=True,
+                    data="Datum ikrafttr�dande")
+    )
+    u_arr = np.array([u for u, _, _, _ in edge_list],
+                     dtype=children_name.dtype)
+    v_arr = np.array([v for _, v, _, _ in edge_list],
+                     dtype=children_name.dtype)
+    k_arr = np.array([k for _, _, k, _ in edge_list], dtype=np.int64)
+    date_arr = np.array([d for _, _, _, d in edge_list],
+                        dtype="datetime64[ns]")
+
+    return children_name, u_arr, v_arr, k_arr, date_arr
+
+
 def create_children_graph(graph, node, date,
                           print_info=True):
     """
@@ -114,26 +416,16 @@ def create_children_graph(graph, node, date,
         Induced graph
     """
 
-    # Compute distance from the given node to its children
-    # and extract the names of the children nodes
-    children_name = np.array(
-            list(
-            nx.single_source_shortest_path_length(
-                G=graph, source=node
-            ).keys()
-        )
+    # Look up the (memoized) descendants of the node and the dated
+    # edges among them
+    _GRAPHS[id(graph)] = graph
+    _, u_arr, v_arr, k_arr, date_arr = (
+        _descendants_and_edges(id(graph), node)
     )
-    
-    # Filter out edges older than the given date 
-    future_edges = [
-            (k) for k, v in (
-                nx.get_edge_attributes(
-                    G=graph.subgraph(nodes=children_name),
-                    name="Datum ikrafttr�dande"
-                ).items()
-            )
-            if v >= date
-    ]
+
+    # Filter out edges older than the given date
+    mask = date_arr >= date
+    future_edges = list(zip(u_arr[mask], v_arr[mask], k_arr[mask]))
     if (len(future_edges) == 0):  # No edges found
         if(print_info):
             print("No changes found for geographic unit %s after %s"
@@ -157,48 +449,235 @@ def create_children_graph(graph, node, date,
     return subgraph
 
 
-def find_current_geo(graph, node, date, all_current,
-                     print_info=True):
+@nb.njit(cache=True)
+def _bfs_visited(src_id, indptr, dst_ids, n_nodes):
+    """
+    Plain breadth-first search over the CSR adjacency starting from
+    src_id, without any date filtering
+
+    Parameters
+    ----------
+    src_id : int
+        Id of the query node
+    indptr, dst_ids : np.1darray
+        CSR arrays of an EdgeTable
+    n_nodes : int
+        Total number of node ids
+
+    Returns
+    -------
+    visited : np.1darray
+        Boolean reachability mask over the node ids
     """
-    Find the geographic units that the given node is part of by taking the 
+
+    visited = np.zeros(n_nodes, dtype=np.bool_)
+    queue = np.empty(n_nodes, dtype=np.int32)
+    visited[src_id] = True
+    queue[0] = src_id
+    head = 0
+    tail = 1
+    while head < tail:
+        u = queue[head]
+        head += 1
+        for e in range(indptr[u], indptr[u + 1]):
+            v = dst_ids[e]
+            if not visited[v]:
+                visited[v] = True
+                queue[tail] = v
+                tail += 1
+    return visited
+
+
+def find_current_geo_batch(edge_table, node, dates, all_current_set,
+                           in_current_mask, print_info=True):
+    """
+    Find the current geographic units for one node at several query
+    dates in a single pass
+
+    The edges reachable from the node are collected once. A later
+    query date only filters out more of them, so the dates are walked
+    in descending order while qualifying edges are switched on
+    incrementally; the whole batch costs O(edges + dates) instead of
+    one full traversal per date.
+
+    Parameters
+    ----------
+    edge_table : EdgeTable
+        Edge table built by `build_edge_table`
+    node : str
+        Query node name
+    dates : np.1darray
+        Query dates, in any order
+    all_current_set : set
+        Current municipality codes
+    in_current_mask : np.1darray
+        Boolean mask over the node ids built by `build_current_mask`
+    print_info : bool, optional
+        Should information about the results be printed?
+
+    Returns
+    -------
+    currents : list of np.1darray
+        Current code(s) for each query date, in the order given
+    """
+
+    node_id = edge_table.node2id.get(node)
+    if node_id is None:
+        # O(1) hash lookup; membership on an ndarray would scan it
+        if node in all_current_set:
+            return [np.array([node]) for _ in range(len(dates))]
+        raise ValueError("Geographic unit %s doesn't exist." % (node))
+
+    # Collect the edges reachable from the node, regardless of date
+    indptr = edge_table.indptr
+    visited_ids = np.flatnonzero(
+        _bfs_visited(node_id, indptr, edge_table.dst_ids,
+                     edge_table.node_names.size)
+    )
+    counts = indptr[visited_ids + 1] - indptr[visited_ids]
+    edge_pos = np.concatenate(
+        [np.arange(indptr[u], indptr[u + 1]) for u in visited_ids]
+    )
+    edge_src = np.repeat(visited_ids, counts)
+    edge_dst = edge_table.dst_ids[edge_pos]
+    edge_date = edge_table.dates[edge_pos]
+
+    # Sort the reachable edges by descending date so they can be
+    # switched on as the query date decreases
+    order = np.argsort(edge_date)[::-1]
+    edge_src = edge_src[order]
+    edge_dst = edge_dst[order]
+    edge_date = edge_date[order]
+
+    # Walk the query dates in descending order with a second pointer
+    # into the edge arrays, accumulating endpoints of qualifying edges
+    mask = np.zeros(edge_table.node_names.size, dtype=bool)
+    currents = [None] * len(dates)
+    i = 0
+    for j in np.argsort(dates)[::-1]:
+        date = dates[j].astype("datetime64[D]").astype(np.int64)
+        while i < edge_date.size and edge_date[i] >= date:
+            mask[edge_src[i]] = True
+            mask[edge_dst[i]] = True
+            i += 1
+        if (i == 0):  # No qualifying edges: include the node itself
+            if (print_info):
+                print("No changes found for geographic unit %s after %s"
+                      % (node, dates[j])
+                )
+            current = (
+                np.array([node]) if in_current_mask[node_id]
+                else np.array([], dtype=edge_table.node_names.dtype)
+            )
+        else:
+            current = edge_table.node_names[mask & in_current_mask]
+        if (print_info):
+            print("Geographic unit", node, "is now part of unit(s)",
+                  current)
+        currents[j] = current
+
+    return currents
+
+
+def find_descendant_mask(edge_table, node, date,
+                         print_info=True):
+    """
+    Find all descendants of the given node that are touched by a
+    change taking effect on or after the given date, as a boolean mask
+    over the node-id space of the edge table
+
+    Parameters
+    ----------
+    edge_table : EdgeTable
+        Edge table built by `build_edge_table`
+    node : str
+        Query node name
+    date : np.datetime64
+        Query date
+    print_info : bool, optional
+        Should information about the result be printed?
+
+    Returns
+    -------
+    mask : np.1darray
+        Boolean mask over the node ids, True for the endpoints of the
+        remaining edges
+    """
+
+    node_id = edge_table.node2id.get(node)
+    if node_id is None:
+        raise KeyError(
+            "Geographic unit %s is not in the change data" % (node)
+        )
+
+    # Run the compiled BFS over the CSR adjacency; the returned mask
+    # marks the endpoints of reachable edges no older than the date,
+    # which is exactly the node set of the old edge_subgraph
+    mask = _bfs_future_nodes(
+        node_id,
+        date.astype("datetime64[D]").astype(np.int64),
+        edge_table.indptr, edge_table.dst_ids, edge_table.dates,
+        edge_table.node_names.size
+    )
+
+    # Print info
+    if (print_info):
+        n_desc = np.count_nonzero(mask)
+        if (n_desc == 0):
+            print("No changes found for geographic unit %s after %s"
+                  % (node, date)
+            )
+        else:
+            print("Geographic unit %s has %s descendant unit(s)"
+                  % (node, n_desc)
+            )
+
+    return mask
+
+
+def find_current_geo(edge_table, node, date, all_current_set,
+                     in_current_mask, print_info=True):
+    """
+    Find the geographic units that the given node is part of by taking the
     intersection of all its children
-    
+
     Parameters
     ----------
-    graph : NetworkX graph
-        Original graph
+    edge_table : EdgeTable
+        Edge table built by `build_edge_table`
     node : str
         Query node name
     date : np.datetime64
         Query date
-    all_current : np.ndarray
-        Current municipality codes 
+    all_current_set : set
+        Current municipality codes
+    in_current_mask : np.1darray
+        Boolean mask over the node ids built by `build_current_mask`
     print_info : bool, optional
         Should information about the graph object be printed?
-        
+
     Returns
     -------
     current : np.1darray
         1D array of current code(s)
     """
 
-    # Create subgraph induced by the given node and date
+    # Find the descendant mask for the given node and date
     # If no future edges are found, be sure to include the node itself
     try:
-        subgraph = create_children_graph(graph, node, date,
-                                         print_info=print_info)
-        subgraph_nodes = np.array(list(subgraph))
-        if (subgraph_nodes.size == 0):
-            subgraph_nodes = np.array([node])
-    except nx.NodeNotFound:
-        if node in all_current:
-            subgraph_nodes = np.array([node])
+        mask = find_descendant_mask(edge_table, node, date,
+                                    print_info=print_info)
+        if (not mask.any()):
+            mask[edge_table.node2id[node]] = True
+        # Intersecting with the current codes is a single AND over the
+        # two masks
+        current = edge_table.node_names[mask & in_current_mask]
+    except KeyError:
+        # O(1) hash lookup; membership on an ndarray would scan it
+        if node in all_current_set:
+            current = np.array([node])
         else:
             raise ValueError("Geographic unit %s doesn't exist." % (node))
-    current = np.intersect1d(
-        ar1=subgraph_nodes,
-        ar2=all_current
-    )
     
     if(print_info):
         print("Geographic unit", node, "is now part of unit(s)", current) 
@@ -206,19 +685,21 @@ def find_current_geo(graph, node, date, all_current,
     return current
 
 
-def plot_graph(graph, save_dot=None,
+def plot_graph(df_change, save_dot=None,
                plot_path=None, prog="fdp",
                date=None, old_style="dashed", edge_color="date",
                node_attrs=None, edge_attrs=None, graph_attrs=None,
                node=None, plot_subgraph=None,
                **kwargs):
     """
-    Plot the given graph and (optionally) the subgraph induced by the given node
-    
+    Plot the change graph and (optionally) the subgraph induced by the given
+    node
+
     Parameters
     ----------
-    graph : NetworkX graph
-        Graph to be plotted
+    df_change : pd.DataFrame
+        Change data as returned by `read_geo_changes`; the NetworkX
+        graph is built here because plotting is its only consumer
     save_dot : str, optional
         Path to save the DOT code of the graph
     plot_path : str, optional
@@ -258,40 +739,53 @@ def plot_graph(graph, save_dot=None,
         induced by the given node
     """
     
+    # Convert to multidigraph; the nested-dict graph representation is
+    # only needed here, so it is built lazily rather than by callers
+    graph = create_nx_graph(
+        df=df_change,
+        print_info=True,
+        source="Gammal kod",
+        target="Ny kod",
+        edge_attr=["Datum ikrafttr�dande", "�ndringstyp"],
+        create_using=nx.MultiDiGraph()
+    )
+
     # Color and style for edges
     # Get times of change
     edge_time = nx.get_edge_attributes(
         G=graph,
         name="Datum ikrafttr�dande"
     )
-    change_times = np.unique(
-        np.array(
-            [v for _, v in edge_time.items()]
-        )
-    )
+    # factorize returns the sorted unique times and, in the same pass,
+    # the index of each edge's time within them, so the codes double
+    # as palette indices and no per-edge dict lookup is needed
+    edge_dates = np.fromiter(edge_time.values(), dtype="datetime64[ns]",
+                             count=len(edge_time))
+    codes, change_times = pd.factorize(edge_dates, sort=True)
+    # Pick every edge's style in one vectorized comparison against the
+    # date; the per-edge Python work left below is only dict packing
+    if (date is not None and old_style is not None):
+        style_arr = np.where(edge_dates < date, old_style, "bold")
+    else:
+        style_arr = np.full(edge_dates.size, "bold")
     if (edge_color == "date"):  # both color and style
         # One color for each change time
         colors = sns.cubehelix_palette(
             n_colors=change_times.size,
             **kwargs
         ).as_hex()
-        time_color = dict(zip(change_times, colors))
-        edge_color_style = {
-            key:{"color":time_color[val],
-                 "style":(old_style if (date is not None and
-                                        val < date and
-                                        old_style is not None)
-                          else "bold")
-                } for key, val in edge_time.items()
-        }
+        time_color = dict(zip(pd.DatetimeIndex(change_times), colors))
+        color_arr = np.asarray(colors)[codes]
+        edge_color_style = dict(
+            zip(edge_time.keys(),
+                ({"color":c, "style":s}
+                 for c, s in zip(color_arr, style_arr)))
+        )
     elif (edge_color is None):  # style only
-        edge_color_style = {
-            key:{"style":(old_style if (date is not None and
-                                        val < date
-                                        and old_style is not None)
-                          else "bold")
-                } for key, val in edge_time.items()
-        }
+        edge_color_style = dict(
+            zip(edge_time.keys(),
+                ({"style":s} for s in style_arr))
+        )
     else:
         raise ValueError("edge_color can currently only be date")
     # Add the attributes above to the graph
@@ -406,22 +900,17 @@ def main():
         )
     geo_in_shp = np.loadtxt(fname=fp_current, dtype=str)
     df_change = read_geo_changes(fp_chg)
-    
-    # Convert to multidigraph
-    graph = create_nx_graph(
-        df=df_change,
-        print_info=True,
-        source="Gammal kod",
-        target="Ny kod",
-        edge_attr=["Datum ikrafttr�dande", "�ndringstyp"],
-        create_using=nx.MultiDiGraph()
-    )
-    
+
+    # Flatten to an edge table for querying
+    edge_table = build_edge_table(df_change)
+    in_current_mask = build_current_mask(edge_table, geo_in_shp)
+
     # Find current geographic units
     current_codes = find_current_geo(
-        graph=graph,
+        edge_table=edge_table,
         node=node, date=date,
-        all_current=geo_in_shp,
+        all_current_set=set(geo_in_shp.tolist()),
+        in_current_mask=in_current_mask,
         print_info=True
     )
 
@@ -443,7 +932,7 @@ def main():
     
         if (plot_sub):
             agraph, sub_agraph = plot_graph(
-                graph=graph,
+                df_change=df_change,
                 save_dot=namebase + "/full_graph.dot",
                 plot_path=namebase + "/full_graph.pdf",
                 prog="fdp", date=date,
@@ -457,7 +946,7 @@ def main():
             )
         else:
             sub_agraph = plot_graph(
-                graph=graph,
+                df_change=df_change,
                 save_dot=namebase + "/full_graph.dot",
                 plot_path=namebase + "/full_graph.pdf",
                 prog="fdp", date=date,